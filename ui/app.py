@@ -1,16 +1,328 @@
 import streamlit as st
+import hashlib
 import httpx
-import json
+import io
+import ijson
+import orjson
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-import pandas as pd
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd   # imported lazily where the report is rendered
 
 # Add parent directory to path to import from app package
-sys.path.insert(0, str(Path(__file__).parent.parent))
+ROOT = str(Path(__file__).parent.parent)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
 
 from app.json_cleaner import clean_json
 
 API_URL = "http://localhost:8000/evaluate"   # Change when deployed
+STREAM_URL = f"{API_URL}/stream"   # NDJSON variant used for incremental rendering
+JSON_HEADERS = {"Content-Type": "application/json"}
+STREAM_THRESHOLD_BYTES = 5_000_000   # Context files above this are stream-parsed
+# ijson prefixes of context entries in each layout the backend accepts
+CONTEXT_PREFIXES = ("item", "data.vector_data.item", "contexts.item", "vector_data.item")
+NON_WHITESPACE = re.compile(rb"\S")   # Emptiness check without stripping a copy of the upload
+REPORT_CACHE_TTL = 3600   # Seconds a finished report is reused for identical inputs
+REPORT_CACHE_SIZE = 32
+
+# Model choices per provider: display name -> model id
+OPENAI_MODELS = {
+    "GPT-4o Mini (Fast & Cheap)": "gpt-4o-mini",
+    "GPT-4 Turbo (Most Capable)": "gpt-4-turbo",
+    "GPT-3.5 Turbo (Legacy)": "gpt-3.5-turbo"
+}
+GEMINI_MODELS = {
+    "Gemini 2.5 Flash (Latest)": "gemini-2.5-flash",
+    "Gemini 2.0 Flash (Fast)": "gemini-2.0-flash",
+    "Gemini 1.5 Flash (Recommended)": "gemini-1.5-flash",
+    "Gemini 1.5 Pro (Most Capable)": "gemini-1.5-pro"
+}
+OPENAI_DISPLAYS = tuple(OPENAI_MODELS)
+GEMINI_DISPLAYS = tuple(GEMINI_MODELS)
+
+
+def _stream_context_vectors(raw: bytes):
+    """Stream-parse a large context file, keeping only the fields the API reads.
+
+    Mirrors the layouts accepted by ``parse_jsons_from_objects``: a top-level
+    array, a dict with ``data`` (``data.vector_data``, falling back to a
+    top-level ``contexts``) or a dict with ``vector_data``. The file is parsed
+    in a single pass. Returns None when it is not strict JSON (e.g. contains
+    comments or trailing commas) so the caller can clean it.
+    """
+    found = {prefix: [] for prefix in CONTEXT_PREFIXES}
+    top_level = None
+    has_data = False
+    events = ijson.parse(io.BytesIO(raw), use_float=True)
+    try:
+        for prefix, event, value in events:
+            if top_level is None:
+                top_level = event
+            elif prefix == "" and event == "map_key" and value == "data":
+                has_data = True
+            elif prefix in found and event == "start_map":
+                # Build just this context entry from the event stream
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                depth = 1
+                while depth:
+                    _, event, value = next(events)
+                    builder.event(event, value)
+                    if event in ("start_map", "start_array"):
+                        depth += 1
+                    elif event in ("end_map", "end_array"):
+                        depth -= 1
+                entry = builder.value
+                if "text" in entry:
+                    found[prefix].append({"text": entry["text"], "source_url": entry.get("source_url")})
+    except ijson.JSONError:
+        return None
+
+    if top_level == "start_array":
+        return found["item"]
+    if has_data:
+        return found["data.vector_data.item"] or found["contexts.item"]
+    return found["vector_data.item"]
+
+
+@st.cache_resource
+def _http_client() -> httpx.Client:
+    """Shared HTTP client so keep-alive connections to the backend are reused."""
+    return httpx.Client(
+        timeout=50.0,   # long timeout for LLM processing
+        limits=httpx.Limits(max_keepalive_connections=4),
+    )
+
+
+@st.cache_resource
+def _report_cache() -> OrderedDict:
+    """Finished reports keyed on the request body hash, shared across sessions."""
+    return OrderedDict()
+
+
+@st.cache_resource
+def _report_cache_lock() -> threading.Lock:
+    """Guards _report_cache(); every session thread reads and mutates it."""
+    return threading.Lock()
+
+
+def _is_complete(result: dict) -> bool:
+    """True once the streamed report includes the "evaluation" chunk."""
+    return "relevance_score" in result
+
+
+def _cached_report(key: str):
+    """Return the cached report for a request body hash, or None if missing or expired."""
+    cache = _report_cache()
+    with _report_cache_lock():
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > REPORT_CACHE_TTL:
+            del cache[key]
+            return None
+        return entry[1]
+
+
+def _store_report(key: str, result: dict):
+    """Cache a complete report, evicting the oldest entries beyond REPORT_CACHE_SIZE."""
+    if not _is_complete(result):
+        return
+    cache = _report_cache()
+    with _report_cache_lock():
+        cache[key] = (time.monotonic(), result)
+        cache.move_to_end(key)
+        while len(cache) > REPORT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8, ttl=3600)
+def _prepare_upload(file_id: str, _raw: bytes, is_context: bool = False) -> Optional[bytes]:
+    """Clean and validate an uploaded JSON file.
+
+    Returns None when the upload is valid JSON and can be forwarded as-is,
+    otherwise the cleaned (or, for large contexts, slimmed) JSON bytes to send.
+    Cached on the upload's file_id, so reruns with the same uploads skip the
+    work. ``_raw`` is the uploaded file's bytes; the leading underscore keeps
+    Streamlit from hashing them, and cache_resource shares the result
+    instead of pickling a copy per hit.
+    """
+    if is_context and len(_raw) > STREAM_THRESHOLD_BYTES:
+        vectors = _stream_context_vectors(_raw)
+        if vectors is not None:
+            return orjson.dumps(vectors)
+    try:
+        # Fast path: most uploads are already valid JSON and need no cleaning
+        orjson.loads(_raw)
+        return None
+    except orjson.JSONDecodeError:
+        return clean_json(_raw.decode("utf-8")).encode("utf-8")
+
+
+def _build_body(conversation: bytes, context_vectors: bytes, model_type: str, model_name: str) -> bytes:
+    """Assemble the /evaluate request body around already-serialized JSON documents.
+
+    The uploads are spliced in as-is, so they are never parsed into Python
+    objects just to be serialized again.
+    """
+    options = orjson.dumps({"model_type": model_type, "model_name": model_name})
+    return b'{"conversation":' + conversation + b',"context_vectors":' + context_vectors + b"," + options[1:]
+
+
+# ---- Report Tables ----
+# Cached on the context list so reruns (e.g. sidebar changes) reuse the frames
+@st.cache_data(show_spinner=False, max_entries=16)
+def _build_context_df(ctxs: list) -> "pd.DataFrame":
+    import pandas as pd
+
+    # Build column arrays directly instead of one dict per row
+    return pd.DataFrame({
+        "#": range(1, len(ctxs) + 1),
+        "Similarity Score": [f"{c['similarity_score']:.4f}" for c in ctxs],
+        "Source URL": [c['source_url'] or "N/A" for c in ctxs],
+        "Context Text": [t if len(t) <= 100 else t[:100] + "..." for t in (c['text'] for c in ctxs)]
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _build_context_details_df(ctxs: list) -> "pd.DataFrame":
+    import pandas as pd
+
+    return pd.DataFrame({
+        "#": range(1, len(ctxs) + 1),
+        "Similarity": [f"{c['similarity_score']:.4f}" for c in ctxs],
+        "Source": [c['source_url'] or "N/A" for c in ctxs],
+        "Text": [c['text'] for c in ctxs]
+    })
+
+
+# ---- Report Sections ----
+def _render_scores(result: dict):
+    # 1. Scores Summary (Table)
+    import pandas as pd
+
+    st.markdown("### 📈 Evaluation Scores")
+    scores_df = pd.DataFrame({
+        "Metric": ["Relevance", "Completeness", "Accuracy"],
+        "Score (1-10)": [
+            result["relevance_score"],
+            result["completeness_score"],
+            result["accuracy_score"]
+        ]
+    })
+    st.dataframe(scores_df, width='stretch')
+
+
+def _render_response(result: dict):
+    # 2. Generated Response
+    st.markdown("### 💬 Generated Response")
+    st.info(result["generated_response"])
+
+
+def _render_prompt(result: dict):
+    # 3. Prompt Used
+    st.markdown("### 🔤 Prompt Used for Generation")
+    with st.expander("View Prompt"):
+        st.text(result["prompt_used"])
+
+
+def _render_metrics(result: dict):
+    # 4. Performance Metrics
+    import pandas as pd
+
+    st.markdown("### ⏱️ Performance Metrics")
+    metrics_df = pd.DataFrame({
+        "Metric": ["Latency", "Cost"],
+        "Value": [
+            f"{result['latency_ms']:.2f} ms",
+            f"${result['cost_usd']:.4f}"
+        ]
+    })
+    st.dataframe(metrics_df, width='stretch')
+
+
+def _render_hallucinations(result: dict):
+    # 5. Hallucinations
+    st.markdown("### ⚠️ Detected Hallucinations")
+    if result["hallucinations"]:
+        import pandas as pd
+
+        hal_df = pd.DataFrame({
+            "Hallucination": result["hallucinations"]
+        })
+        st.dataframe(hal_df, width='stretch')
+    else:
+        st.success("✅ No hallucinations detected")
+
+
+def _render_context(result: dict):
+    # 6. Retrieved Context with Similarity Scores
+    st.markdown("### 🔍 Retrieved Context (Ranked by Similarity)")
+    ctxs = result["retrieved_context"]
+    if ctxs:
+        st.dataframe(_build_context_df(ctxs), width='stretch', height=400)
+        
+        # Full context in a single scrollable table rather than an expander per context
+        st.markdown("#### Full Context Details")
+        st.dataframe(
+            _build_context_details_df(ctxs),
+            width='stretch',
+            height=600,
+            column_config={"Text": st.column_config.TextColumn(width="large")}
+        )
+    else:
+        st.warning("⚠️ No context retrieved")
+
+
+def _render_explanations(result: dict):
+    # 7. Explanations
+    st.markdown("### 📝 Evaluation Explanations")
+    if result["explanations"]:
+        for key, explanation in result["explanations"].items():
+            with st.expander(f"📄 {key.replace('_', ' ').title()}"):
+                st.write(explanation)
+
+
+def _render_raw(result: dict):
+    # 8. Raw JSON (for reference)
+    st.markdown("### 📋 Raw JSON Response")
+    with st.expander("View Raw JSON"):
+        st.json(result)
+
+
+# Report sections in display order
+REPORT_SECTIONS = {
+    "scores": _render_scores,
+    "response": _render_response,
+    "prompt": _render_prompt,
+    "metrics": _render_metrics,
+    "hallucinations": _render_hallucinations,
+    "context": _render_context,
+    "explanations": _render_explanations,
+    "raw": _render_raw,
+}
+
+# Report sections filled in by each chunk of the streamed backend response
+STREAM_SECTIONS = {
+    "context": ("prompt", "context"),
+    "response": ("response", "metrics"),
+    "evaluation": ("scores", "hallucinations", "explanations"),
+}
+
+# Progress shown once each chunk has been rendered
+STREAM_PROGRESS = {
+    "context": (40, "🧠 Generating response..."),
+    "response": (70, "🧮 Running evaluators..."),
+    "evaluation": (90, "🎨 Rendering evaluation report..."),
+}
+
 
 st.set_page_config(page_title="EvalFlow — LLM Evaluation", layout="wide")
 st.title("🚀 EvalFlow — LLM Evaluation Pipeline Tester")
@@ -65,31 +377,20 @@ provider = st.sidebar.radio(
 
 # Model selection based on provider
 if provider == "OpenAI":
-    openai_models = {
-        "GPT-4o Mini (Fast & Cheap)": "gpt-4o-mini",
-        "GPT-4 Turbo (Most Capable)": "gpt-4-turbo",
-        "GPT-3.5 Turbo (Legacy)": "gpt-3.5-turbo"
-    }
     selected_model_display = st.sidebar.selectbox(
         "📊 Select OpenAI Model",
-        list(openai_models.keys()),
+        OPENAI_DISPLAYS,
         help="Free tier supports GPT-4o Mini (limited requests)"
     )
-    selected_model = openai_models[selected_model_display]
+    selected_model = OPENAI_MODELS[selected_model_display]
     st.sidebar.caption("💡 Free tier: Use GPT-4o Mini for best value")
 else:
-    gemini_models = {
-        "Gemini 2.5 Flash (Latest)": "gemini-2.5-flash",
-        "Gemini 2.0 Flash (Fast)": "gemini-2.0-flash",
-        "Gemini 1.5 Flash (Recommended)": "gemini-1.5-flash",
-        "Gemini 1.5 Pro (Most Capable)": "gemini-1.5-pro"
-    }
     selected_model_display = st.sidebar.selectbox(
         "📊 Select Gemini Model",
-        list(gemini_models.keys()),
+        GEMINI_DISPLAYS,
         help="Free tier supports all models with quota limits"
     )
-    selected_model = gemini_models[selected_model_display]
+    selected_model = GEMINI_MODELS[selected_model_display]
     st.sidebar.caption("💡 Free tier: Generous quota for all models")
 
 # Apply Configuration Button
@@ -135,7 +436,7 @@ with col2:
 if run_button:
     # Skip file processing if already evaluated successfully
     if st.session_state.evaluation_complete:
-        # Use previously parsed JSON from session state
+        # Use previously cleaned JSON from session state
         conversation_json = st.session_state.get("last_conversation_json")
         context_json = st.session_state.get("last_context_json")
         if not conversation_json or not context_json:
@@ -148,21 +449,22 @@ if run_button:
             st.stop()
 
         try:
-            # Parse uploaded JSONs with cleaning
-            conv_raw = conv_file.read().decode("utf-8")
-            ctx_raw = ctx_file.read().decode("utf-8")
+            # Read uploaded JSONs
+            conv_bytes = conv_file.getvalue()
+            ctx_bytes = ctx_file.getvalue()
             
             # Validate files are not empty
-            if not conv_raw.strip():
+            if not NON_WHITESPACE.search(conv_bytes):
                 st.error("❌ Conversation file is empty. Please upload a valid JSON file.")
                 st.stop()
-            if not ctx_raw.strip():
+            if not NON_WHITESPACE.search(ctx_bytes):
                 st.error("❌ Context file is empty. Please upload a valid JSON file.")
                 st.stop()
             
-            # Clean and parse JSON
-            conversation_json = json.loads(clean_json(conv_raw))
-            context_json = json.loads(clean_json(ctx_raw))
+            # Clean and validate JSON (large context files are streamed instead)
+            # None means the upload is valid as-is and its bytes are forwarded directly
+            conversation_json = _prepare_upload(conv_file.file_id, conv_bytes) or conv_bytes
+            context_json = _prepare_upload(ctx_file.file_id, ctx_bytes, is_context=True) or ctx_bytes
         except ValueError as e:
             st.error(f"⚠️ JSON Validation Error: {str(e)}")
             st.info("💡 Tip: Make sure your JSON files are not empty and contain valid JSON data.")
@@ -172,143 +474,85 @@ if run_button:
             st.info("💡 Tip: Ensure files are valid JSON format (not binary or corrupted).")
             st.stop()
 
-    payload = {
-        "conversation": conversation_json,
-        "context_vectors": context_json,
-        "model_type": "openai" if provider == "OpenAI" else "gemini",
-        "model_name": selected_model
-    }
+    body = _build_body(
+        conversation_json,
+        context_json,
+        model_type="openai" if provider == "OpenAI" else "gemini",
+        model_name=selected_model
+    )
 
     # ---- API Call ----
     progress_container = st.container()
     
     with progress_container:
-        progress_bar = st.progress(0, text="🔄 Starting evaluation...")
-        status_text = st.empty()
+        # Uploads are already parsed at this point, so progress starts at the request
+        progress_bar = st.progress(20, text="📡 Sending request to API... (20%)")
         
         try:
-            # Step 1: Parse files
-            status_text.text("📂 Parsing JSON files...")
-            progress_bar.progress(10, text="📂 Parsing JSON files... (10%)")
-            
-            client = httpx.Client(timeout=50.0)   # long timeout for LLM processing
-            
-            # Step 2: Send request
-            status_text.text("📡 Sending request to API...")
-            progress_bar.progress(20, text="📡 Sending request to API... (20%)")
-            
-            response = client.post(API_URL, json=payload)
-            client.close()
-            
-            # Step 3: Check response
-            status_text.text("✔️ Received response from API...")
-            progress_bar.progress(30, text="✔️ Received response from API... (30%)")
-            
-            if response.status_code != 200:
-                st.error(f"❌ API Error [{response.status_code}]: {response.text}")
-                st.stop()
-
-            result = response.json()
-            
-            # Step 4: Processing results
-            status_text.text("🔄 Processing results...")
-            progress_bar.progress(50, text="🔄 Processing results... (50%)")
-            
-            # Step 5: Rendering report
-            status_text.text("🎨 Rendering evaluation report...")
-            progress_bar.progress(75, text="🎨 Rendering evaluation report... (75%)")
+            cache_key = hashlib.sha256(body).hexdigest()
+            result = _cached_report(cache_key)
+            if result is not None:
+                # Identical inputs were evaluated recently: reuse that report
+                st.subheader("📊 Evaluation Report")
+                for render in REPORT_SECTIONS.values():
+                    render(result)
+            else:
+                with _http_client().stream("POST", STREAM_URL, content=body, headers=JSON_HEADERS) as response:
+                    if response.status_code != 200:
+                        response.read()
+                        st.error(f"❌ API Error [{response.status_code}]: {response.text}")
+                        st.stop()
+                    
+                    # ---- Display Results in Tabular Format ----
+                    # Placeholders keep the report order while sections arrive out of order
+                    st.subheader("📊 Evaluation Report")
+                    placeholders = {name: st.empty() for name in REPORT_SECTIONS}
+                    result = {}
+                    
+                    # Render each section as soon as its chunk arrives
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = orjson.loads(line)
+                        section = chunk.pop("section")
+                        if section == "error":
+                            st.error(f"❌ API Error: {chunk['detail']}")
+                            st.stop()
+                        
+                        result.update(chunk)
+                        for name in STREAM_SECTIONS[section]:
+                            with placeholders[name].container():
+                                REPORT_SECTIONS[name](result)
+                        
+                        percent, message = STREAM_PROGRESS[section]
+                        progress_bar.progress(percent, text=f"{message} ({percent}%)")
+                    
+                    # A stream that ends without its "evaluation" line is a failed run
+                    if not _is_complete(result):
+                        st.error("❌ API Error: report stream ended before the evaluation finished")
+                        progress_bar.progress(0, text="❌ Error occurred")
+                        st.stop()
+                    
+                    with placeholders["raw"].container():
+                        REPORT_SECTIONS["raw"](result)
+                
+                _store_report(cache_key, result)
 
             st.success("✅ Evaluation Completed Successfully!")
             progress_bar.progress(100, text="✅ Complete! (100%)")
             
-            # Clear status after completion
-            status_text.empty()
-            
             # Mark evaluation as complete to prevent re-validation on re-render
             st.session_state.evaluation_complete = True
             st.session_state.last_conversation_json = conversation_json
             st.session_state.last_context_json = context_json
-            
-            # ---- Display Results in Tabular Format ----
-            st.subheader("📊 Evaluation Report")
-            
-            # 1. Scores Summary (Table)
-            st.markdown("### 📈 Evaluation Scores")
-            scores_df = pd.DataFrame({
-                "Metric": ["Relevance", "Completeness", "Accuracy"],
-                "Score (1-10)": [
-                    result["relevance_score"],
-                    result["completeness_score"],
-                    result["accuracy_score"]
-                ]
-            })
-            st.dataframe(scores_df, width='stretch')
-            
-            # 2. Generated Response
-            st.markdown("### 💬 Generated Response")
-            st.info(result["generated_response"])
-            
-            # 3. Prompt Used
-            st.markdown("### 🔤 Prompt Used for Generation")
-            with st.expander("View Prompt"):
-                st.text(result["prompt_used"])
-            
-            # 4. Performance Metrics
-            st.markdown("### ⏱️ Performance Metrics")
-            metrics_df = pd.DataFrame({
-                "Metric": ["Latency", "Cost"],
-                "Value": [
-                    f"{result['latency_ms']:.2f} ms",
-                    f"${result['cost_usd']:.4f}"
-                ]
-            })
-            st.dataframe(metrics_df, width='stretch')
-            
-            # 5. Hallucinations
-            st.markdown("### ⚠️ Detected Hallucinations")
-            if result["hallucinations"]:
-                hal_df = pd.DataFrame({
-                    "Hallucination": result["hallucinations"]
-                })
-                st.dataframe(hal_df, width='stretch')
-            else:
-                st.success("✅ No hallucinations detected")
-            
-            # 6. Retrieved Context with Similarity Scores
-            st.markdown("### 🔍 Retrieved Context (Ranked by Similarity)")
-            if result["retrieved_context"]:
-                context_data = []
-                for i, ctx in enumerate(result["retrieved_context"], 1):
-                    context_data.append({
-                        "#": i,
-                        "Similarity Score": f"{ctx['similarity_score']:.4f}",
-                        "Source URL": ctx['source_url'] if ctx['source_url'] else "N/A",
-                        "Context Text": ctx['text'][:100] + "..." if len(ctx['text']) > 100 else ctx['text']
-                    })
-                context_df = pd.DataFrame(context_data)
-                st.dataframe(context_df, width='stretch', height=400)
-                
-                # Option to expand and view full context
-                st.markdown("#### Full Context Details")
-                for i, ctx in enumerate(result["retrieved_context"], 1):
-                    with st.expander(f"Context #{i} (Similarity: {ctx['similarity_score']:.4f})"):
-                        st.write(f"**Source URL:** {ctx['source_url'] if ctx['source_url'] else 'N/A'}")
-                        st.write(f"**Text:** {ctx['text']}")
-            else:
-                st.warning("⚠️ No context retrieved")
-            
-            # 7. Explanations
-            st.markdown("### 📝 Evaluation Explanations")
-            if result["explanations"]:
-                for key, explanation in result["explanations"].items():
-                    with st.expander(f"📄 {key.replace('_', ' ').title()}"):
-                        st.write(explanation)
-            
-            # 8. Raw JSON (for reference)
-            st.markdown("### 📋 Raw JSON Response")
-            with st.expander("View Raw JSON"):
-                st.json(result)
+            st.session_state.last_result = result
 
         except Exception as e:
             st.error(f"🚨 Error connecting to backend: {e}")
             progress_bar.progress(0, text="❌ Error occurred")
+
+elif st.session_state.get("last_result"):
+    # Rerun without a new evaluation: show the last report again
+    st.subheader("📊 Evaluation Report")
+    for render in REPORT_SECTIONS.values():
+        render(st.session_state.last_result)